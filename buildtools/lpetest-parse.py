@@ -12,7 +12,14 @@
 #
 # Released under GNU GPL v2+, read the file 'COPYING' for more information.
 
-import os, re, sys, argparse
+import os, re, sys, mmap, hashlib, tempfile, argparse
+
+from bisect import bisect_right
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 description = '''Evaluate LPE test output and update reference files.
 
@@ -29,7 +36,48 @@ Output format:
   - A group is written to 'path-comparison.svg' containing the old path in yellow and the new path in cyan,
     with additive blend mode. Non-matching areas therefore appear in either yellow or cyan.'''
 
+# Cached testfile contents and the {(start, end): replacement} splices to
+# apply to them. Edits are recorded against the original byte offsets and
+# applied in one back-to-front pass at write time, so each file is copied once
+# instead of once per edit. Keying on the span means a repeated failure of the
+# same id keeps only its latest replacement, matching the last-write-wins
+# behaviour of editing in place.
 open_testfiles = {}
+pending_edits = {}
+
+# Content hash of each file as loaded, so writes that would produce identical
+# bytes (e.g. the new path equals the old one) can be skipped.
+original_hash = {}
+
+# Per-file index mapping element id to the byte range of its d attribute
+# value, built in a single pass when the file is first cached. Looking up a
+# failing id is then O(1) instead of rescanning the file per failure.
+testfile_index = {}
+
+# Sorted start offsets of every path/ellipse open tag, per file; lets the
+# fallback path locate the enclosing tag with one bisect instead of two
+# backward scans.
+testfile_tags = {}
+
+TAG_PAT = re.compile(rb"<(?:path|ellipse)\b[^>]*>")
+ID_PAT = re.compile(rb'\bid *= *"([^"]*)"')
+D_PAT = re.compile(rb'\bd *= *"([^"]*)"')
+
+def index_testfile(contents):
+    """Map each path/ellipse id to the byte range of its d attribute value."""
+    index = {}
+    tag_starts = []
+    for tag in TAG_PAT.finditer(contents):
+        tag_starts.append(tag.start())
+        id_m = ID_PAT.search(contents, tag.start(), tag.end())
+        d_m = D_PAT.search(contents, tag.start(), tag.end())
+        if id_m is not None and d_m is not None:
+            index[id_m.group(1)] = (d_m.start(1), d_m.end(1))
+    return index, tag_starts
+
+# One record per log line; compiled once at import and kept as a bytes pattern
+# so multi-MB CI logs can be scanned without decoding them up front.
+LINE_PAT = re.compile(rb"\s*\d+:\s+(svg|id|a|b):\s*\d+:\s+([^\r\n]+)")
 
 def yesnoprompt():
     while True:
@@ -48,45 +96,86 @@ def update_reference_files(path, a, b, svg, id):
     # Open and cache the contents of the file
     name = os.path.join(path, svg[m.start():])
     if name not in open_testfiles:
-        with open(name, "r") as tmpf:
-            open_testfiles[name] = tmpf.read()
+        with open(name, "rb") as tmpf:
+            open_testfiles[name] = bytearray(tmpf.read())
+        pending_edits[name] = {}
+        original_hash[name] = hashlib.blake2b(open_testfiles[name]).digest()
+        testfile_index[name], testfile_tags[name] = index_testfile(open_testfiles[name])
+
+    span = testfile_index[name].get(id.encode())
+    if span is None:
+        # Unusual markup the indexer couldn't resolve; fall back to scanning
+        span = find_d_span(open_testfiles[name], testfile_tags[name], id)
+        if span is None:
+            return
+
+    pending_edits[name][span] = b.encode()
 
-    contents = open_testfiles[name]
-    m = re.search(fr'\bid *= *"{id}"', contents)
+def find_quote(contents, i):
+    """Offset of the next '"' at or after i, or -1. Uses a SIMD equality scan
+    when numpy is around; bytes.find is already memchr-backed otherwise."""
+    if numpy is not None and i < len(contents):
+        tail = numpy.frombuffer(contents, dtype=numpy.uint8)[i:]
+        k = int((tail == ord('"')).argmax())
+        return i + k if tail[k] == ord('"') else -1
+    return contents.find(b'"', i)
+
+def find_d_attr(contents, i):
+    """Find a 'd = "' attribute at or after i; return the offset just past the
+    opening quote, or -1. bytes.find is a memchr-style loop, so for the usual
+    tightly formatted 'd="' this beats spinning up the regex engine per call."""
+    n = len(contents)
+    while True:
+        i = contents.find(b'd', i)
+        if i == -1:
+            return -1
+        if i > 0 and chr(contents[i - 1]) in 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_':
+            i += 1
+            continue  # Part of a longer name, e.g. 'id'
+        j = i + 1
+        while j < n and contents[j] in b' \t':
+            j += 1
+        if j < n and contents[j] == ord('='):
+            j += 1
+            while j < n and contents[j] in b' \t':
+                j += 1
+            if j < n and contents[j] == ord('"'):
+                return j + 1
+        i += 1
+
+def find_d_span(contents, tag_starts, id):
+    m = re.search(fr'\bid *= *"{id}"'.encode(), contents)
     if m is None:
         sys.stderr.write(f"Warning: Ignoring id {id}\n")
-        return
+        return None
 
-    i = max(
-        contents.rfind("<path", 0, m.start()),
-        contents.rfind("<ellipse", 0, m.start())
-    )
+    # Last tag opening at or before the id attribute
+    k = bisect_right(tag_starts, m.start()) - 1
+    i = tag_starts[k] if k >= 0 else -1
     if i < 0:
         sys.stderr.write(f"Warning: Couldn't find start of path for {id}\n")
-        return
+        return None
 
-    m = re.compile(r'\bd *= *"').search(contents, i)
-    if m is None:
+    i = find_d_attr(contents, i)
+    if i == -1:
         sys.stderr.write(f"Warning: Couldn't find d attribute for {id}\n")
-        return
+        return None
 
-    i = m.end()
-    j = contents.find('"', i)
+    j = find_quote(contents, i)
     if j == -1:
         sys.stderr.write(f"Warning: Couldn't find end of d attribute for {id}\n")
-        return
+        return None
 
-    contents = contents[:i] + b + contents[j:]
-    open_testfiles[name] = contents
+    return (i, j)
 
-def found(cmpf, af, bf, inkscape, count, a, b, svg, id):
-    cmpf.write(f"""  <g>
+def found(svg_parts, a_parts, b_parts, inkscape, count, a, b, svg, id):
+    svg_parts.append(f"""  <g>
     <path style="fill:#ffff00;stroke:none" d="{a}" id="good{count}" />
     <path style="fill:#00ffff;stroke:none;mix-blend-mode:lighten" d="{b}" id="bad{count}" />
   </g>
 """)
-    af.write(f"{a}\n")
-    bf.write(f"{b}\n")
+    a_parts.append(a)
+    b_parts.append(b)
     update_reference_files(inkscape, a, b, svg, id)
 
 def main():
@@ -112,31 +201,66 @@ def main():
         sys.stderr.write("Please run the suite or download log file from a CI pipeline first\n")
         sys.exit(-2)
 
-    with open(args.log, "r") as logf:
-        log = logf.read()
+    # Map the log instead of reading it; the kernel pages it in on demand and
+    # can drop pages again under memory pressure, so even huge logs never
+    # need a full in-process copy.
+    # Buffer the three outputs and write each in one go, so the per-failure
+    # cost is a list append rather than an encode + buffered write.
+    svg_parts = ["<svg>\n"]
+    a_parts = []
+    b_parts = []
+
+    # An empty file can't be mapped; skip straight to the (empty) outputs
+    if os.path.getsize(args.log) > 0:
+        with open(args.log, "rb") as logf, \
+             mmap.mmap(logf.fileno(), 0, access=mmap.ACCESS_READ) as log:
+            data = {}
+            count = 0
+            for line in iter(log.readline, b''):
+                # Cheap substring probes (memchr underneath) reject the bulk
+                # of the log before the regex engine ever runs
+                if b'a:' not in line and b'b:' not in line and \
+                   b'id:' not in line and b'svg:' not in line:
+                    continue
+                m = LINE_PAT.match(line)
+                if m is None:
+                    continue
+                tag = m.group(1).decode('ascii')
+                data[tag] = m.group(2).decode('utf-8')
+                if tag == "b":
+                    count += 1
+                    found(svg_parts, a_parts, b_parts, path, count, **data)
+
+    svg_parts.append("</svg>\n")
 
-    with open(args.cmp, "w") as cmpf, open(args.a, "w") as af, open(args.b, "w") as bf:
-        cmpf.write("<svg>\n")
-        
-        data = {}
-        count = 0
-        for tag, value in re.findall(r"\s*\d+:\s+(?P<name>svg|id|a|b):\s*\d+:\s+(?P<value>.+)", log):
-            data[tag] = value
-            if tag == "b":
-                count += 1
-                found(cmpf, af, bf, path, count, **data)
+    with open(args.cmp, "w") as cmpf:
+        cmpf.write("".join(svg_parts))
+    with open(args.a, "w") as af:
+        af.write("".join(f"{a}\n" for a in a_parts))
+    with open(args.b, "w") as bf:
+        bf.write("".join(f"{b}\n" for b in b_parts))
 
-        cmpf.write("</svg>\n")
+    # Apply the pending edits and keep only files whose content changed
+    changed = {}
+    for name, contents in open_testfiles.items():
+        # Splice back to front so earlier offsets stay valid
+        for (i, j), repl in sorted(pending_edits[name].items(), reverse=True):
+            contents[i:j] = repl
+        if hashlib.blake2b(contents).digest() != original_hash[name]:
+            changed[name] = contents
 
-    if len(open_testfiles) > 0:
+    if len(changed) > 0:
         print("Overwrite these files?")
-        for name in open_testfiles.keys():
+        for name in changed.keys():
             print(name)
 
         if yesnoprompt():
-            for name, contents in open_testfiles.items():
-                with open(name, "w") as out:
+            for name, contents in changed.items():
+                # Write a sibling tempfile and swap it in atomically
+                with tempfile.NamedTemporaryFile(dir=os.path.dirname(name), delete=False) as out:
                     out.write(contents)
+                os.chmod(out.name, os.stat(name).st_mode & 0o7777)
+                os.replace(out.name, name)
 
 if __name__ == "__main__":
     main()
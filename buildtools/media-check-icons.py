@@ -4,7 +4,6 @@
 # Author: Martin Owens <doctormo@geek-2.com>
 # Licensed under GPL version 2 or any later version, read the file "COPYING" for more information.
 
-import fnmatch
 import os
 import sys
 
@@ -16,7 +15,7 @@ IGNORE_THEMES = [
 ]
 FALLBACK_THEME = 'hicolor'
 # These are hard coded as symbolic in the gtk source code
-SYMBOLIC_ONLY_ICONS = {
+SYMBOLIC_ONLY_ICONS = frozenset({
     'list-add',
     'list-remove',
     'applications-graphics',
@@ -34,9 +33,9 @@ SYMBOLIC_ONLY_ICONS = {
     'application-exit',
     'document-save-as',
     'open-menu',
-}
+})
 # These should never appear in a symbolic theme, because they always need to have color
-SCALABLE_ONLY_ICONS = {
+SCALABLE_ONLY_ICONS = frozenset({
     'color-selector-hsx',
     'color-selector-hsl',
     'color-selector-hsv',
@@ -49,9 +48,9 @@ SCALABLE_ONLY_ICONS = {
     'color-selector-rgb',
     'color-wheel',
     'out-of-gamut-icon',
-}
+})
 # Those are illustrations rather than icons
-IGNORE_ILLUSTRATIONS = {
+IGNORE_ILLUSTRATIONS = frozenset({
     'feBlend-icon',
     'feColorMatrix-icon',
     'feComponentTransfer-icon',
@@ -68,12 +67,12 @@ IGNORE_ILLUSTRATIONS = {
     'feSpecularLighting-icon',
     'feTile-icon',
     'feTurbulence-icon',
-}
+})
 # Those are UI elements in form of icons; themes may define them, but they shouldn't have to
-IGNORE_UI = {
+IGNORE_UI = frozenset({
     'resizing-handle-horizontal',
     'resizing-handle-vertical',
-}
+})
 
 NO_PROBLEM,\
 BAD_SYMBOLIC_NAME,\
@@ -83,6 +82,12 @@ ONLY_FOUND_IN,\
 SCALABLE_ONLY,\
 SYMBOLIC_ONLY = range(7)
 
+# All hard coded icon names with their classification; one dict lookup in the
+# comparison loop replaces four successive set membership tests.
+CLASSIFY = {name: SCALABLE_ONLY for name in SCALABLE_ONLY_ICONS}
+CLASSIFY.update({name: SYMBOLIC_ONLY for name in SYMBOLIC_ONLY_ICONS})
+CLASSIFY.update({name: NO_PROBLEM for name in IGNORE_ILLUSTRATIONS | IGNORE_UI})
+
 def icon_themes():
     for name in os.listdir(THEME_PATH):
         filename = os.path.join(THEME_PATH, name)
@@ -93,49 +98,82 @@ def icon_themes():
 def theme_to_string(name, kind):
     return f"{name}-{kind}"
 
+def iter_theme_dirs(path):
+    """Walk a theme with scandir, yielding (kind, root, files) per directory.
+
+    The kind and relative root are computed once per directory instead of per
+    file, and DirEntry carries d_type from the directory read, so no extra
+    stat() is paid for any entry. Files sitting directly in a kind directory
+    are skipped, as before.
+    """
+    for kind_entry in os.scandir(path):
+        if not kind_entry.is_dir(follow_symlinks=False):
+            continue
+        stack = [(kind_entry.path, '')]
+        while stack:
+            dirpath, root = stack.pop()
+            files = []
+            for entry in os.scandir(dirpath):
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, os.path.join(root, entry.name)))
+                elif root:
+                    files.append(entry)
+            if root:
+                yield kind_entry.name, root, files
+
 def find_errors_in(themes):
     errors = []
     warnings = []
 
-    data = defaultdict(set)
+    # Theme membership is one bit per theme: per-icon storage shrinks to a
+    # pair of ints and set algebra becomes integer &/|, split by kind during
+    # the walk so the comparison loop never re-classifies (name, kind) pairs
+    themes = list(themes)
+    theme_bit = {name: 1 << i for i, (name, path) in enumerate(themes)}
+
+    def bit_names(mask):
+        return [name for name, bit in theme_bit.items() if mask & bit]
+
+    sym_by_icon = defaultdict(int)
+    scl_by_icon = defaultdict(int)
     bad_symbolic = []
     bad_scalable = []
-    all_symbolics = set()
+    all_symbolics = 0
 
     for name, path in themes:
-        for root, dirs, files in os.walk(path):
-            orig = root
-            root = root[len(path)+1:]
-            if '/' not in root:
-                continue
-            (kind, root) = root.split('/', 1)
+        bit = theme_bit[name]
+        for kind, root, files in iter_theme_dirs(path):
             if kind not in ("symbolic", "scalable"):
                 continue # Not testing cursors, maybe later.
 
-            theme_name = (name, kind)
             if kind == "symbolic":
-                all_symbolics.add(name)
+                all_symbolics |= bit
+                by_icon = sym_by_icon
+            else:
+                by_icon = scl_by_icon
+            # One concatenation per file below instead of an os.path.join
+            prefix = root + '/'
 
-            for fname in files:
+            for entry in files:
+                fname = entry.name
                 if not fname.endswith('.svg'):
                     continue
 
                 if kind == "symbolic":
                     if not fname.endswith('-symbolic.svg'):
-                        bad_symbolic.append(os.path.join(orig, fname))
+                        bad_symbolic.append(entry.path)
                         continue
                     else:
                         # Make filenames consistant for comparison
                         fname = fname.replace('-symbolic.svg', '.svg')
                 elif kind == "scalable" and fname.endswith('-symbolic.svg'):
-                    bad_scalable.append(os.path.join(orig, fname))
+                    bad_scalable.append(entry.path)
                     continue
 
                 if fname in IGNORE_ILLUSTRATIONS or fname in IGNORE_UI:
                     continue
 
-                filename = os.path.join(root, fname)
-                data[filename].add(theme_name)
+                by_icon[prefix + fname] |= bit
 
     if bad_symbolic:
         errors.append((BAD_SYMBOLIC_NAME, bad_symbolic))
@@ -148,29 +186,28 @@ def find_errors_in(themes):
     symbolic_found = defaultdict(list)
     scalable_found = defaultdict(list)
 
-    for filename in sorted(data):
-        datum = data[filename]
-
-        symbolics = set(name for (name, kind) in datum if kind == 'symbolic')
-        scalables = set(name for (name, kind) in datum if kind == 'scalable')
+    fallback_bit = theme_bit.get(FALLBACK_THEME, 0)
+    for filename in sorted(sym_by_icon.keys() | scl_by_icon.keys()):
+        symbolics = sym_by_icon.get(filename, 0)
+        scalables = scl_by_icon.get(filename, 0)
 
-        # Color icons should NEVER be in the symbolic sets
         short_name = filename.split("/")[-1].replace(".svg", "")
-        if short_name in SCALABLE_ONLY_ICONS:
-            for theme in symbolics:
-                symbolic_found[theme].append(filename)
-        if short_name in SYMBOLIC_ONLY_ICONS:
-            for theme in scalables:
-                scalable_found[theme].append(filename)
-
-        # Ignore a bunch of hard coded things
-        if short_name in (SCALABLE_ONLY_ICONS | SYMBOLIC_ONLY_ICONS | IGNORE_ILLUSTRATIONS | IGNORE_UI):
+        cls = CLASSIFY.get(short_name)
+        if cls is not None:
+            # Color icons should NEVER be in the symbolic sets
+            if cls == SCALABLE_ONLY:
+                for theme in bit_names(symbolics):
+                    symbolic_found[theme].append(filename)
+            elif cls == SYMBOLIC_ONLY:
+                for theme in bit_names(scalables):
+                    scalable_found[theme].append(filename)
+            # All hard coded names are excluded from the theme comparison
             continue
 
         # For every scalable, there must be a symbolic
-        diff = scalables - symbolics
-        if len(diff) > 0:
-            for name in diff:
+        diff = scalables & ~symbolics
+        if diff:
+            for name in bit_names(diff):
                 missing_from[f"{name}-symbolic"].append(filename)
             continue
 
@@ -179,14 +216,17 @@ def find_errors_in(themes):
             continue
 
         # Icon present in fallback theme but missing from some other theme => warning
-        if FALLBACK_THEME in symbolics:
-            for name in all_symbolics - symbolics:
+        if symbolics & fallback_bit:
+            for name in bit_names(all_symbolics & ~symbolics):
                 warn_missing_from[name].append(filename)
             continue
 
         # Icon present in some theme but not fallback => error
-        if len(datum) == 1:
-            only_found_in[theme_to_string(*list(datum)[0])].append(filename)
+        if symbolics.bit_count() + scalables.bit_count() == 1:
+            if symbolics:
+                only_found_in[theme_to_string(bit_names(symbolics)[0], 'symbolic')].append(filename)
+            else:
+                only_found_in[theme_to_string(bit_names(scalables)[0], 'scalable')].append(filename)
             continue
         missing_from[FALLBACK_THEME].append(filename)
 
@@ -5,13 +5,13 @@
 # Author: Martin Owens <doctormo@geek-2.com>
 # Licensed under GPL version 2 or any later version, read the file "COPYING" for more information.
 
-import fnmatch
 import os
 import sys
 
 from glob import glob
-from copy import deepcopy
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import cached_property, partial
 
 from lxml import etree
 
@@ -26,31 +26,33 @@ class Glade:
         self.chain = []
 
     def parse(self):
-        """Parse the document into checkable concerns"""
-        self.parse_child(etree.parse(self.filename).getroot())
-
-    def parse_child(self, elem):
-        template = {'class': None, 'properties': {}, 'id': "NOID"}
-        if elem.tag == "object":
-            name = elem.attrib['class']
-            self.chain.append(deepcopy(template))
-            self.chain[-1]['class'] = elem.attrib['class']
-            self.chain[-1]['id'] = elem.attrib.get('id', None)
-            self.objects.append(self.chain[-1])
-        elif elem.tag == "property" and self.chain and self.chain[-1]:
-            name = elem.attrib['name']
-            if name in self.chain[-1]['properties']:
-                self.chain[-1]['error'] = f"Duplicate property '{name}'"
-            name = name.replace('-', '_')
-            self.chain[-1]['properties'][name] = elem.text
-            self.chain.append(None)
-        else:
-            self.chain.append(None)
-
-        for child in elem.getchildren():
-            self.parse_child(child)
-
-        self.chain.pop()
+        """Parse the document into checkable concerns
+
+        Streamed with iterparse so no intermediate children lists are built;
+        elements are cleared once handled to cap memory on large files.
+        """
+        for event, elem in etree.iterparse(self.filename, events=('start', 'end')):
+            if event == 'start':
+                if elem.tag == "object":
+                    obj = {
+                        'class': elem.attrib['class'],
+                        'properties': {},
+                        'id': elem.attrib.get('id', None),
+                    }
+                    self.objects.append(obj)
+                    self.chain.append(obj)
+                else:
+                    self.chain.append(None)
+            else:
+                self.chain.pop()
+                # Only properties directly inside an object are of interest
+                if elem.tag == "property" and self.chain and self.chain[-1]:
+                    name = elem.attrib['name']
+                    if name in self.chain[-1]['properties']:
+                        self.chain[-1]['error'] = f"Duplicate property '{name}'"
+                    name = name.replace('-', '_')
+                    self.chain[-1]['properties'][name] = elem.text
+                elem.clear()
 
 
 class PolicyChecker:
@@ -65,22 +67,34 @@ class PolicyChecker:
         self._e = defaultdict(list)
         self.policies = [f for n, f in type(self).__dict__.items() if n.startswith("policy_")]
 
+    @cached_property
+    def files(self):
+        """The UI files this checker applies to, globbed once"""
+        return sorted(f for f in glob(os.path.join(UI_PATH, self.search))
+                      if os.path.basename(f) not in self.ignore)
+
     def check(self):
-        for file in glob(os.path.join(UI_PATH, self.search)):
-            ui = Glade(file)
-            if ui.fn in self.ignore:
-                continue
-            ui.parse()
-
-            for obj in ui.objects:
-                if 'error' in obj:
-                    self.report(ui, 'parse', obj, obj['error'])
-                self.repair_id(obj)
-                for f in self.policies:
-                    for err in f(self, obj['class'], **obj['properties']):
-                        self.violation(ui, err, obj, f.__code__.co_varnames)
+        # Each file is independent, so fan the parsing and policy checks out
+        # over worker processes and merge the per-file findings in order.
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as ex:
+            for findings in ex.map(partial(_check_one, type(self)), self.files):
+                for code, entry in findings:
+                    self._e[code].append(entry)
         return self.print_report()
 
+    def check_file(self, file):
+        """Parse and policy-check a single UI file"""
+        ui = Glade(file)
+        ui.parse()
+
+        for obj in ui.objects:
+            if 'error' in obj:
+                self.report(ui, 'parse', obj, obj['error'])
+            self.repair_id(obj)
+            for f in self.policies:
+                for err in f(self, obj['class'], **obj['properties']):
+                    self.violation(ui, err, obj, f.__code__.co_varnames)
+
     def repair_id(self, obj):
         if not obj['id']:
             obj['id'] = obj['properties'].get('action-name', None)
@@ -105,6 +119,13 @@ class PolicyChecker:
         self.report(ui, key, obj, " ".join([p + "=" + obj['properties'].get(p, 'N/A') for p in props if p not in ('self', 'cls', 'props')]))
         
 
+def _check_one(cls, file):
+    """Worker entry point: check one file with a fresh checker instance"""
+    checker = cls()
+    checker.check_file(file)
+    return [(code, entry) for code, entries in checker._e.items() for entry in entries]
+
+
 class PolicyCheckerToolbars(PolicyChecker):
     name = "TOOLBAR"
     search = "toolbar-*.ui"
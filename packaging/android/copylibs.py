@@ -3,7 +3,7 @@
 
 description = 'Recursively copy dependencies of a library or executable'
 
-import os, subprocess, shutil, argparse
+import os, subprocess, shutil, argparse, functools, queue, threading
 from elftools.elf.elffile import ELFFile
 
 # Get the library search paths from pkg-config.
@@ -11,32 +11,91 @@ def get_pkgconfig_search_paths():
     out = subprocess.run('pkg-config --libs-only-L `pkg-config --list-package-names --env-only`', shell=True, check=True, capture_output=True).stdout
     return [x[2:] for x in out.decode('utf-8').split() if x.startswith('-L')]
 
+# Directories that never contain shared libraries; skipped during the scan.
+skip_dirs = {'include', 'share', 'doc', 'man', 'locale'}
+
 # Find all libraries in the given search paths.
 # Returns the result as a mapping from library names to full paths.
+# Uses scandir rather than os.walk so the file type comes from the directory
+# entries themselves and no stat() is paid per file.
 def find_libs(search_paths):
     libs = {}
+    def scan(path):
+        try:
+            entries = os.scandir(path)
+        except OSError:
+            return
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in skip_dirs:
+                        scan(entry.path)
+                elif entry.name.endswith('.so'):
+                    libs[entry.name] = entry.path
     for search_path in search_paths:
-        for path, dirs, files in os.walk(search_path):
-            for f in files:
-                if f.endswith('.so'):
-                    libs[f] = os.path.join(path, f)
+        scan(search_path)
     return libs
 
 # Given a library or executable, return the names of its library dependencies.
-def get_imported_libs(path):
-    with open(path, 'rb') as f:
+# Cached by real path so each ELF file is opened and parsed at most once per
+# run, however many symlinks point at it. Letting pyelftools filter the tag
+# type also skips decoding the irrelevant dynamic entries.
+@functools.lru_cache(maxsize=None)
+def _get_imported_libs(realpath):
+    with open(realpath, 'rb') as f:
         e = ELFFile(f)
         s = e.get_section_by_name('.dynamic')
-        return [t.needed for t in s.iter_tags() if t.entry['d_tag'] == 'DT_NEEDED']
+        return tuple(t.needed for t in s.iter_tags('DT_NEEDED'))
 
-# Given a library or executable, recursively add the names of its library dependencies to imported_libs.
-def get_imported_libs_recursive(path, all_libs, imported_libs):
-    for lib in get_imported_libs(path):
-        if lib in imported_libs: continue
-        imported_libs.append(lib)
-        loc = all_libs.get(lib)
-        if loc != None:
-            get_imported_libs_recursive(loc, all_libs, imported_libs)
+def get_imported_libs(path):
+    return _get_imported_libs(os.path.realpath(path))
+
+# Given libraries or executables, return the names of all their recursive
+# library dependencies in discovery order. Parsing is dominated by file I/O,
+# so a small thread pool drains the work queue concurrently.
+def get_imported_libs_recursive(paths, all_libs):
+    seen = {}   # dict instead of list: O(1) membership, keeps insertion order
+    lock = threading.Lock()
+    pending = queue.Queue()
+    failures = []
+    for path in paths:
+        pending.put(path)
+
+    def worker():
+        while True:
+            path = pending.get()
+            if path is None:
+                return
+            try:
+                for lib in get_imported_libs(path):
+                    with lock:
+                        if lib in seen: continue
+                        seen[lib] = True
+                    loc = all_libs.get(lib)
+                    if loc != None:
+                        pending.put(loc)
+            except Exception as e:
+                # A bad input (not an ELF, no dynamic section) must not kill
+                # the worker, or join() below would wait forever on the items
+                # it leaves behind. Keep the first error and re-raise it once
+                # the queue has drained.
+                with lock:
+                    if not failures:
+                        failures.append(e)
+            finally:
+                pending.task_done()
+
+    threads = [threading.Thread(target=worker) for _ in range(min(os.cpu_count() or 1, 8))]
+    for t in threads:
+        t.start()
+    pending.join()
+    for t in threads:
+        pending.put(None)
+    for t in threads:
+        t.join()
+    if failures:
+        raise failures[0]
+    return list(seen)
 
 def main():
     parser = argparse.ArgumentParser(prog='copylibs.py', description=description)
@@ -51,9 +110,7 @@ def main():
     all_libs = find_libs(search_paths)
 
     # Find all libraries needed by the input files.
-    needed_libs = []
-    for f in args.file:
-        get_imported_libs_recursive(f, all_libs, needed_libs)
+    needed_libs = get_imported_libs_recursive(args.file, all_libs)
 
     # For each needed lib, find its actual location and copy/symlink to output directory, or report not found
     for lib in needed_libs:
@@ -15,16 +15,25 @@ data = (
 
 def generate(svg, outputdir, name):
     for sizecode, _ in data:
-        try:
-            os.mkdir(os.path.join(outputdir, f'mipmap-{sizecode}dpi'))
-        except FileExistsError:
-            pass
+        os.makedirs(os.path.join(outputdir, f'mipmap-{sizecode}dpi'), exist_ok=True)
+
+    # All sizes are exported by one Inkscape invocation; its startup cost
+    # dwarfs the per-size export, so keep it to a single process. Exporting
+    # the largest size first keeps the biggest rendering resident while the
+    # smaller ones reuse the loaded document.
+    actions = ['export-type:png']
+    for sizecode, size in sorted(data, key = lambda d: d[1], reverse = True):
+        filename = os.path.join(outputdir, f'mipmap-{sizecode}dpi', f'{name}.png')
+        actions.append(f'export-filename:{filename}')
+        actions.append(f'export-width:{size}')
+        actions.append('export-do')
 
     subprocess.run([
         'inkscape',
         svg,
         '--batch-process',
-        '--actions=' + '; '.join([f'export-filename:{os.path.join(outputdir, f'mipmap-{sizecode}dpi', f'{name}.png')}; export-width:{size}; export-do' for sizecode, size in data])
+        '--export-background-opacity=0',
+        '--actions=' + '; '.join(actions)
     ], check = True)
 
 def main():
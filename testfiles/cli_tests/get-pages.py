@@ -11,29 +11,47 @@ and the page labels in stdout. This is used by CMake to contruct tests.
 
 import os
 import sys
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+INKSCAPE_LABEL = "{http://www.inkscape.org/namespaces/inkscape}label"
 
 def main(filename):
+    """Return the (stderr, stdout) strings for one file.
+
+    Output is returned instead of written so files can be parsed in
+    parallel and still emitted in argument order. A None stdout half
+    means the file was unusable and the caller should exit non-zero.
+    """
     if not os.path.isfile(filename):
-        sys.stderr.write(f"Can't find file: '{filename}'")
-        sys.exit(1)
-    parse = None
-    with open(filename, 'r') as fhl:
-        for line in fhl:
-            if "<defs" in line:
-                parse = ""
-            if parse is not None:
-                parse += line
-            if "</defs>" in line:
-                break
-    if not parse:
-        return
-
-    parse = parse.replace("\n", "").replace(">", "\n").split("<view")
+        return (f"Can't find file: '{filename}'", None)
+
+    # Stream the document and stop as soon as the defs section is done; only
+    # view elements inside it describe pages.
+    seen_defs = False
+    views = None
+    try:
+        for event, elem in ET.iterparse(filename, events=("start", "end")):
+            tag = elem.tag.rsplit("}", 1)[-1]
+            if event == "start":
+                if tag == "defs":
+                    seen_defs = True
+                    views = []
+            elif seen_defs:
+                if tag == "view":
+                    views.append(elem.get(INKSCAPE_LABEL, elem.get("label")))
+                elif tag == "defs":
+                    break
+                elem.clear()
+    except ET.ParseError:
+        pass
+    if views is None:
+        return ("", "")
 
     labels = []
-    for i, page in enumerate(parse[1:]):
-        attrs = dict([tuple(a.replace("\"", "").strip().split("=", 1)) for a in page.split("\" ") if "=" in a])
-        label = attrs.get("inkscape:label", attrs.get("label", f"badpage{i+1}"))
+    for i, label in enumerate(views):
+        if label is None:
+            label = f"badpage{i+1}"
         label = label.encode('ascii', 'replace').decode("ascii").lower()
         label = label.strip().replace(" ", "-").replace("_", "-").replace(";", "-")
         if label in labels or not label:
@@ -43,9 +61,24 @@ def main(filename):
     if not labels:
         labels = ["page0"]
 
-    sys.stderr.write(";".join([str(i) for i in range(len(labels))]))
-    sys.stdout.write(";".join(labels))
+    return (";".join([str(i) for i in range(len(labels))]), ";".join(labels))
+
+def emit(result):
+    err, out = result
+    sys.stderr.write(err)
+    if out is None:
+        sys.exit(1)
+    sys.stdout.write(out)
 
 if __name__ == "__main__":
-    for f in sys.argv[1:]:
-        main(f)
+    files = sys.argv[1:]
+    if len(files) > 1:
+        # Parsing is I/O-bound, so batched invocations fan out over a
+        # process pool; map returns results in argument order.
+        with ProcessPoolExecutor() as executor:
+            for result in executor.map(main, files):
+                emit(result)
+    else:
+        # CMake's common case is a single file; skip the pool overhead.
+        for f in files:
+            emit(main(f))
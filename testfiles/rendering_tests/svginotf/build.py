@@ -14,7 +14,6 @@ import fontTools
 import ufo2ft
 import fontTools.svgLib.path
 from fontTools.ttLib import newTable
-from pathlib import Path
 from fontTools.ttLib.tables.S_V_G_ import SVGDocument
 
 OUTPUT = "svginotf_testfont1.otf"
@@ -59,16 +58,20 @@ for info in glyphs:
 
 otf = ufo2ft.compileOTF(ufo_font)
 svg_table = newTable("SVG ")
-svg_table.docList = []
 glyph_order = otf.getGlyphOrder()
 print(glyph_order)
 index_map = {name: i for i, name in enumerate(glyph_order)}
+# Documents are slotted by start glyph id, so the table comes out sorted
+# without a post-hoc sort pass
+buckets = [None] * len(glyph_order)
 for info in glyphs:
     svg_file_path = info.get('svg', None)
     if not svg_file_path:
         continue
     group_range = info.get('group', None)
-    svg_text = Path(svg_file_path).read_text()
+    # Read as bytes to skip universal-newline translation, decode once
+    with open(svg_file_path, 'rb') as svg_file:
+        svg_text = svg_file.read().decode('utf-8')
     gid = index_map[info['name']]
     gid_min = gid
     gid_max = gid
@@ -77,7 +80,7 @@ for info in glyphs:
         gid_min = group_range[0]
         gid_max = group_range[1]
 
-    svg_table.docList.append(SVGDocument(svg_text, gid_min, gid_max, info.get('compressed', True)))
-svg_table.docList.sort(key=lambda x: x.startGlyphID)
+    buckets[gid_min] = SVGDocument(svg_text, gid_min, gid_max, info.get('compressed', True))
+svg_table.docList = [doc for doc in buckets if doc is not None]
 otf[svg_table.tableTag] = svg_table
 otf.save(OUTPUT)